@@ -12,27 +12,61 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import atexit
 import logging
 import os
+import queue
+import re
+import threading
+import time
 import warnings
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 import argilla as rg
+import httpx
 from argilla._constants import DEFAULT_API_KEY, DEFAULT_API_URL
-from haystack.agents import Agent, Tool
-from haystack.agents.agent_step import AgentStep
-from packaging.version import parse
+from argilla.client.feedback.constants import PUSHING_BATCH_SIZE
+from argilla.client.sdk.commons.errors import BaseClientError
+from argilla.client.singleton import ArgillaSingleton
 
 from argilla_haystack.helpers import (
+    _TRUNCATION_MARKER_BYTES,
     create_svg_with_durations,
     create_tree_with_durations,
+    truncate_text,
 )
 
+if TYPE_CHECKING:
+    from haystack.agents import Agent, Tool
+    from haystack.agents.agent_step import AgentStep
+
 _LOGGER = logging.getLogger(__name__)
 _LOGGER.setLevel(logging.INFO)
 
 
+def _version_tuple(version: str) -> Tuple[int, ...]:
+    """Convert the numeric release segment of a version string into a comparable tuple"""
+    return tuple(
+        int(part) for part in re.match(r"\d+(?:\.\d+)*", version).group().split(".")
+    )
+
+
+_ARGILLA_VERSION = _version_tuple(rg.__version__)
+_MIN_ARGILLA_VERSION = (1, 18, 0)
+
+_ACTIVE_CREDENTIALS: Optional[Tuple[str, str]] = None
+_ACTIVE_CLIENT: Optional[Any] = None
+_WARNED_DEFAULT_KEY = False
+_WARNED_DEFAULT_URL = False
+
+_FLUSH = object()
+
+# Only errors raised before the request reached the server are retried, since `add_records`
+# is not idempotent and a retried batch could otherwise be stored twice
+_RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
 class ArgillaCallbackHandler:
     """Callback manager that logs into Argilla
 
@@ -46,11 +80,15 @@ class ArgillaCallbackHandler:
             API URL will be used.
         api_key: The API key of the Argilla API. Defaults to 'None', in which case the default
             API key will be used.
+        max_field_bytes: The maximum size in bytes of the UTF-8 encoded prompt, response and
+            transcript of a record. Longer texts are truncated. Defaults to 64 KiB.
+
+    The connection to Argilla and the `FeedbackDataset` are set up by the background worker the
+    first time that records are submitted. Setup and submission failures are logged, not raised.
 
     Raises:
         ImportError: If the `argilla` Python package is not installed or the one installed is not compatible
-        ConnectionError: If the connection to Argilla fails
-        FileNotFoundError: If the retrieval and creation of the `FeedbackDataset` fails
+        ValueError: If `max_field_bytes` is too small to fit the truncation marker
 
     Example:
         >>> from haystack.nodes import PromptNode
@@ -69,15 +107,49 @@ class ArgillaCallbackHandler:
     REPO_URL: str = "https://github.com/argilla-io/argilla"
     ISSUES_URL: str = f"{REPO_URL}/issues"
 
+    # A remote dataset keeps the client that retrieved it, so the API key is part of the key
+    _DATASET_CACHE: Dict[Tuple[str, str, str, str], Any] = {}
+    _SETUP_LOCK = threading.Lock()
+
+    __slots__ = (
+        "ARGILLA_VERSION",
+        "agent_duration",
+        "api_key",
+        "api_url",
+        "dataset_name",
+        "finish_time",
+        "guidelines",
+        "metadata",
+        "questions",
+        "start_time",
+        "tool_durations",
+        "tool_names",
+        "tool_start_time",
+        "tool_start_times",
+        "workspace_name",
+        "_batch_size",
+        "_dataset",
+        "_flush_interval",
+        "_has_tools",
+        "_max_field_bytes",
+        "_max_retries",
+        "_queue",
+        "_queue_full_warned",
+        "_ready",
+        "_ready_lock",
+        "_worker",
+    )
+
     def __init__(
         self,
-        agent: Agent,
+        agent: "Agent",
         dataset_name: str,
         workspace_name: Optional[str] = None,
         api_url: Optional[str] = None,
         api_key: Optional[str] = None,
         questions: Optional[List[Any]] = None,
         guidelines: Optional[str] = None,
+        max_field_bytes: int = 64 * 1024,
     ) -> None:
         """Initialize the ArgillaCallback
 
@@ -91,103 +163,175 @@ class ArgillaCallbackHandler:
                 API URL will be used.
             api_key: The API key of the Argilla API. Defaults to 'None', in which case the default
                 API key will be used.
+            max_field_bytes: The maximum size in bytes of the UTF-8 encoded prompt, response and
+                transcript of a record. Longer texts are truncated. Defaults to 64 KiB.
 
         Raises:
             ImportError: If the `argilla` Python package is not installed or the one installed is not compatible
-            ConnectionError: If the connection to Argilla fails
-            FileNotFoundError: If the retrieval and creation of the `FeedbackDataset` fails
+            ValueError: If `max_field_bytes` is too small to fit the truncation marker
         """
-        self._setup_callbacks(agent)
+        if max_field_bytes < _TRUNCATION_MARKER_BYTES:
+            raise ValueError(
+                f"`max_field_bytes` must be at least {_TRUNCATION_MARKER_BYTES} bytes to fit the "
+                f"truncation marker, but it is {max_field_bytes}."
+            )
         self.tool_names = agent.tm.get_tool_names().split(", ")
+        self._has_tools = self.tool_names != [""]
+        self._setup_callbacks(agent)
 
         self.ARGILLA_VERSION = rg.__version__
         self._validate_argilla_version()
         self.api_key = api_key or os.getenv("ARGILLA_API_KEY", DEFAULT_API_KEY)
         self.api_url = api_url or os.getenv("ARGILLA_API_URL", DEFAULT_API_URL)
-        self._init_argilla()
+        self._warn_default_credentials()
         self.dataset_name = dataset_name
-        self.workspace_name = workspace_name or rg.get_workspace()
+        self.workspace_name = workspace_name
         self.questions = questions
         self.guidelines = guidelines
-        self._prepare_dataset()
+        self._dataset = None
+        self._ready = False
+        self._ready_lock = threading.Lock()
         self.metadata = {}
 
         self.start_time = None
         self.finish_time = None
-        self.agent_duration = timedelta(0)
+        self.agent_duration = 0.0
         self.tool_start_times = {}
         self.tool_durations = {}
 
-    def _setup_callbacks(self, agent: Agent):
-        """Configure the agent to use the callback manager's methods"""
-        agent.callback_manager.on_agent_start += self.on_agent_start
-        agent.callback_manager.on_agent_step += self.on_agent_step
-        agent.callback_manager.on_agent_final_answer += self.on_agent_final_answer
-        agent.callback_manager.on_agent_finish += self.on_agent_finish
-
-        agent.tm.callback_manager.on_tool_start += self.on_tool_start
-        agent.tm.callback_manager.on_tool_finish += self.on_tool_finish
-        agent.tm.callback_manager.on_tool_error += self.on_tool_error
+        # One `add_records` request per batch, so that a retry never resends records that were stored
+        self._batch_size = PUSHING_BATCH_SIZE
+        self._flush_interval = 5.0
+        self._max_retries = 3
+        self._max_field_bytes = max_field_bytes
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=1024)
+        self._queue_full_warned = False
+        self._worker = threading.Thread(target=self._submit_records, daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def _setup_callbacks(self, agent: "Agent"):
+        """Configure the agent to use the callback manager's methods, skipping the no-op `on_agent_step` and `on_tool_error`"""
+        agent_callbacks = agent.callback_manager
+        agent_callbacks.on_agent_start += self.on_agent_start
+        agent_callbacks.on_agent_final_answer += self.on_agent_final_answer
+        agent_callbacks.on_agent_finish += self.on_agent_finish
+
+        if self._has_tools:
+            tool_callbacks = agent.tm.callback_manager
+            tool_callbacks.on_tool_start += self.on_tool_start
+            tool_callbacks.on_tool_finish += self.on_tool_finish
 
     def _validate_argilla_version(self):
         """Check if the installed `argilla` version is compatible with the `ArgillaCallbackHandler`"""
-        if parse(self.ARGILLA_VERSION) < parse("1.18.0"):
+        if _ARGILLA_VERSION < _MIN_ARGILLA_VERSION:
             raise ImportError(
                 f"The installed `argilla` version is {self.ARGILLA_VERSION} but "
                 "`ArgillaCallbackHandler` requires at least version 1.18.0. Please "
                 "upgrade `argilla` with `pip install --upgrade argilla`."
             )
 
-    def _init_argilla(self):
-        """Initialize the connection to Argilla"""
-        if self.api_key == DEFAULT_API_KEY:
+    def _warn_default_credentials(self):
+        """Warn once per process if the default Argilla credentials are being used"""
+        global _WARNED_DEFAULT_KEY, _WARNED_DEFAULT_URL
+        if self.api_key == DEFAULT_API_KEY and not _WARNED_DEFAULT_KEY:
+            _WARNED_DEFAULT_KEY = True
             warnings.warn(
                 "Using default api_key='argilla.apikey'. Set `api_key` or `ARGILLA_API_KEY` to override.",
                 stacklevel=2,
             )
 
-        if self.api_url == DEFAULT_API_URL:
+        if self.api_url == DEFAULT_API_URL and not _WARNED_DEFAULT_URL:
+            _WARNED_DEFAULT_URL = True
             warnings.warn(
                 "Using default api_url='http://localhost:6900'. Set `api_url` or `ARGILLA_API_URL` to override.",
                 stacklevel=2,
             )
 
+    def _init_argilla(self):
+        """Initialize the connection to Argilla, unless the client created with the same credentials is still active"""
+        global _ACTIVE_CREDENTIALS, _ACTIVE_CLIENT
+        credentials = (self.api_url, self.api_key)
+        # User code may have called `rg.init` since, replacing the client that was created here
+        if (
+            credentials == _ACTIVE_CREDENTIALS
+            and ArgillaSingleton._INSTANCE is _ACTIVE_CLIENT
+        ):
+            return
         try:
             rg.init(api_key=self.api_key, api_url=self.api_url)
-        except Exception as e:
+        except (BaseClientError, httpx.HTTPError) as e:
             raise ConnectionError(
                 f"Failed to connect to Argilla: '{e}'. Check `api_key` and `api_url` and ensure Argilla server is running. "
                 f"Report persistent issues to {self.ISSUES_URL} as an `integration` issue."
             ) from e
+        _ACTIVE_CREDENTIALS = credentials
+        _ACTIVE_CLIENT = rg.active_client()
+
+    @property
+    def dataset(self) -> rg.FeedbackDataset:
+        """The `FeedbackDataset` where the records are logged, prepared on first access
+
+        Raises:
+            ConnectionError: If the connection to Argilla fails
+            FileNotFoundError: If the retrieval and creation of the `FeedbackDataset` fails
+        """
+        self._ensure_ready()
+        return self._dataset
+
+    def _ensure_ready(self):
+        """Connect to Argilla and prepare the `FeedbackDataset` the first time it is needed"""
+        if self._ready:
+            return
+        with self._ready_lock:
+            if self._ready:
+                return
+            # `rg.init` swaps the process-wide client, so the handlers take turns using it
+            with self._SETUP_LOCK:
+                self._init_argilla()
+                self.workspace_name = self.workspace_name or rg.get_workspace()
+                self._prepare_dataset()
+            self._ready = True
+
+    def _retrieve_dataset(self) -> Optional[rg.FeedbackDataset]:
+        """Retrieve the `FeedbackDataset` from the cache or Argilla, or `None` if it does not exist yet"""
+        cache_key = (self.api_url, self.api_key, self.workspace_name, self.dataset_name)
+        if cache_key in self._DATASET_CACHE:
+            return self._DATASET_CACHE[cache_key]
+        try:
+            return rg.FeedbackDataset.from_argilla(
+                name=self.dataset_name,
+                workspace=self.workspace_name,
+            )
+        except ValueError:
+            return None
 
     def _prepare_dataset(self):
         """Prepare the `FeedbackDataset` for the agent"""
         try:
-            if self.dataset_name in [ds.name for ds in rg.FeedbackDataset.list()]:
-                self.dataset = rg.FeedbackDataset.from_argilla(
-                    name=self.dataset_name,
-                    workspace=self.workspace_name,
-                )
-                if self.tool_names != [""]:
-                    supported_fields = [
+            self._dataset = self._retrieve_dataset()
+            if self._dataset is not None:
+                if self._has_tools:
+                    supported_fields = (
                         "prompt",
                         "response",
                         "transcript",
                         "time-details",
-                    ]
+                    )
                 else:
-                    supported_fields = ["prompt", "response", "time-details"]
-                if supported_fields != [field.name for field in self.dataset.fields]:
+                    supported_fields = ("prompt", "response", "time-details")
+                field_names = tuple(field.name for field in self._dataset.fields)
+                if supported_fields != field_names:
                     raise ValueError(
                         f"`FeedbackDataset` with name={self.dataset_name} in the workspace="
                         f"{self.workspace_name} had fields that are not supported for the"
                         f"`haystack` integration. Supported fields are: {supported_fields}."
-                        f" But the current `FeedbackDataset` fields are {[field.name for field in self.dataset.fields]}."
+                        f" But the current `FeedbackDataset` fields are {field_names}."
                     )
                 _LOGGER.info(
                     f"`FeedbackDataset` with name={self.dataset_name} in the workspace="
                     f"{self.workspace_name} was correctly retrieved from Argilla. The current fields are"
-                    f"{[field.name for field in self.dataset.fields]}. The current questions are {[question.name for question in self.dataset.questions]}.",
+                    f"{field_names}. The current questions are {[question.name for question in self._dataset.questions]}.",
                 )
                 if self.questions or self.guidelines:
                     warnings.warn(
@@ -205,7 +349,7 @@ class ArgillaCallbackHandler:
                         name="time-details", title="Time Details", use_markdown=True
                     ),
                 ]
-                if self.tool_names != [""]:
+                if self._has_tools:
                     fields.insert(2, rg.TextField(name="transcript"))
                 if self.questions is None:
                     self.questions = [
@@ -232,7 +376,7 @@ class ArgillaCallbackHandler:
                     guidelines=self.guidelines,
                     allow_extra_metadata=True,
                 )
-                if self.tool_names != [""]:
+                if self._has_tools:
                     dataset.add_metadata_property(
                         rg.TermsMetadataProperty(
                             name="tool_name", title="Tool Name", values=self.tool_names
@@ -241,7 +385,10 @@ class ArgillaCallbackHandler:
                 dataset.add_metadata_property(
                     rg.TermsMetadataProperty(name="type", title="Type")
                 )
-                self.dataset = dataset.push_to_argilla(self.dataset_name)
+                self._dataset = dataset.push_to_argilla(self.dataset_name)
+            self._DATASET_CACHE[
+                (self.api_url, self.api_key, self.workspace_name, self.dataset_name)
+            ] = self._dataset
         except Exception as e:
             raise FileNotFoundError(
                 f"`FeedbackDataset` retrieval and creation both failed with exception `{e}`."
@@ -253,55 +400,127 @@ class ArgillaCallbackHandler:
         self, name: str, query: str, params: Dict[str, Any], **kwargs: Any
     ) -> None:
         """Save the starting time of the agent and reset the dictionaries for each query"""
-        self.start_time = datetime.now()
+        self.start_time = time.monotonic()
         self.tool_start_times = {}
         self.tool_durations = {}
         self.metadata = {}
 
-    def on_agent_step(self, agent_step: AgentStep, **kwargs: Any) -> None:
+    def on_agent_step(self, agent_step: "AgentStep", **kwargs: Any) -> None:
         """Do nothing when the agent steps"""
         pass
 
-    def on_agent_finish(self, agent_step: AgentStep, **kwargs: Any) -> None:
+    def on_agent_finish(self, agent_step: "AgentStep", **kwargs: Any) -> None:
         """Save the finish time of the agent and calculate the agent duration"""
-        self.finish_time = datetime.now()
-        if self.start_time:
+        self.finish_time = time.monotonic()
+        if self.start_time is not None:
             self.agent_duration = self.finish_time - self.start_time
 
     def on_agent_final_answer(self, final_answer, **kwargs: Any) -> None:
         """Add the query, final answer, transcript and metadata to the record and submit it to Argilla"""
         query = final_answer["query"]
-        answer = final_answer["answers"][0].answer
+        answer = final_answer["answers"][0]
         transcript = final_answer["transcript"]
-        time_data = create_tree_with_durations(
-            str(round(self.agent_duration.total_seconds(), 3)), self.tool_durations
-        )
+        time_data = create_tree_with_durations(self.agent_duration, self.tool_durations)
         time_svg = create_svg_with_durations(time_data)
-        self.metadata["type"] = final_answer["answers"][0].type
 
         add_fields = {
-            "prompt": query,
-            "response": answer,
+            "prompt": self._truncate("prompt", query),
+            "response": self._truncate("response", answer.answer),
+            **(
+                {"transcript": self._truncate("transcript", transcript)}
+                if self._has_tools
+                else {}
+            ),
             "time-details": time_svg,
         }
-        if len(self.dataset.fields) == 4:
-            add_fields["transcript"] = transcript
-            print("transcript added")
-
-        self.dataset.add_records(
-            records=[
-                rg.FeedbackRecord(
-                    fields=add_fields,
-                    metadata=self.metadata,
+
+        try:
+            self._queue.put_nowait(
+                {
+                    "fields": add_fields,
+                    "metadata": {**self.metadata, "type": answer.type},
+                }
+            )
+        except queue.Full:
+            if not self._queue_full_warned:
+                self._queue_full_warned = True
+                _LOGGER.warning(
+                    f"Dropping records because {self._queue.maxsize} records are already"
+                    " waiting to be submitted to Argilla. Check that the Argilla server is reachable."
                 )
-            ]
-        )
-        _LOGGER.info("Records have been updated to Argilla")
 
-    def on_tool_start(self, tool_input: str, tool: Tool):
+    def _truncate(self, field_name: str, text: str) -> str:
+        """Truncate the text of a field so that oversized records are not rejected by Argilla"""
+        truncated = truncate_text(text, self._max_field_bytes)
+        if truncated is not text:
+            _LOGGER.debug(
+                f"The `{field_name}` field was truncated to {self._max_field_bytes} bytes."
+            )
+        return truncated
+
+    def _submit_records(self) -> None:
+        """Submit the queued records to Argilla in batches from the background worker thread"""
+        while True:
+            item = self._queue.get()
+            taken, records = 1, []
+            deadline = time.monotonic() + self._flush_interval
+            while isinstance(item, dict):
+                records.append(item)
+                remaining = deadline - time.monotonic()
+                if len(records) >= self._batch_size or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                taken += 1
+
+            if records:
+                try:
+                    self._add_records(records)
+                    _LOGGER.debug("Records have been updated to Argilla")
+                except Exception as e:
+                    _LOGGER.warning(
+                        f"Failed to submit {len(records)} records to Argilla: `{e}`."
+                    )
+            for _ in range(taken):
+                self._queue.task_done()
+            if item is None:
+                return
+
+    def _add_records(self, records: List[Dict[str, Any]]) -> None:
+        """Add the records to the dataset, retrying with backoff when the connection could not be established"""
+        for attempt in range(self._max_retries + 1):
+            try:
+                self.dataset.add_records(records=records, show_progress=False)
+                return
+            except _RETRYABLE_ERRORS:
+                if attempt == self._max_retries:
+                    raise
+                time.sleep(0.2 * 2**attempt)
+
+    def flush(self) -> None:
+        """Submit the queued records to Argilla and block until they have been submitted"""
+        if self._worker.is_alive():
+            self._queue.put(_FLUSH)
+            self._queue.join()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Submit the queued records to Argilla and stop the background worker thread"""
+        atexit.unregister(self.close)
+        if self._worker.is_alive():
+            self._queue.put(None)
+            self._worker.join(timeout=timeout)
+
+    async def aflush(self) -> None:
+        """Wait for the queued records to be submitted without blocking the running event loop"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.flush)
+
+    def on_tool_start(self, tool_input: str, tool: "Tool"):
         """Save the starting time of the tool"""
-        self.tool_start_time = datetime.now()
-        self.tool_start_times[tool.name] = datetime.now()
+        self.tool_start_time = time.monotonic()
+        self.tool_start_times[tool.name] = self.tool_start_time
 
     def on_tool_finish(
         self,
@@ -311,17 +530,13 @@ class ArgillaCallbackHandler:
         **kwargs: Any,
     ) -> None:
         """Update the metadata with the tool name"""
-        if self.metadata.get("tool_name"):
-            self.metadata["tool_name"].append(tool_name)
-        else:
-            self.metadata["tool_name"] = [tool_name]
+        self.metadata.setdefault("tool_name", []).append(tool_name)
 
         if tool_name and tool_name in self.tool_start_times:
-            start_time = self.tool_start_times[tool_name]
-            finish_time = datetime.now()
-            duration = finish_time - start_time
-            self.tool_durations[tool_name] = str(round(duration.total_seconds(), 3))
+            self.tool_durations[tool_name] = (
+                time.monotonic() - self.tool_start_times[tool_name]
+            )
 
-    def on_tool_error(self, exception: Exception, tool: Tool, **kwargs: Any) -> None:
+    def on_tool_error(self, exception: Exception, tool: "Tool", **kwargs: Any) -> None:
         """Do nothing when the tool errors out"""
         pass
@@ -14,50 +14,69 @@
 
 from typing import Dict, List
 
+_BOX_HEIGHT = 47
+_BOX_WIDTH = _BOX_HEIGHT * 10
+_ROW_CONSTANT = _BOX_HEIGHT + 7
+_INDENT_CONSTANT = 40
+_FONT_SIZE_NODE_NAME = _BOX_HEIGHT * 0.4188
+_FONT_SIZE_TIME = _FONT_SIZE_NODE_NAME - 4
+_TEXT_CENTERING = _BOX_HEIGHT * 0.6341
+_NODE_NAME_INDENT = _BOX_HEIGHT * 0.35
+_TIME_INDENT = _BOX_HEIGHT * 8.75
 
-def create_tree_with_durations(agent_duration: str, tool_durations: Dict) -> List:
-    """Create the tree data to be converted to an SVG, including the agent and tools duration."""
-    data = []
-    data.append((0, 0, "AGENT", agent_duration))
-    current_row = 1
+_SVG_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<svg id="Layer_1" data-name="Layer 1" xmlns="http://www.w3.org/2000/svg" viewBox="0 0 750 %s">
+"""
+_SVG_FOOTER = """
+</svg>"""
 
-    if tool_durations:
-        for tool_name, duration in tool_durations.items():
-            data.append((current_row, 1, tool_name.upper(), duration))
-            current_row += 1
+_TRUNCATION_MARKER = "\n…[truncated]"
+_TRUNCATION_MARKER_BYTES = len(_TRUNCATION_MARKER.encode("utf-8"))
 
+# The layout constants are rendered into the row template once, at import time, so
+# only the position, node name and time of each row are formatted per call
+_ROW_TEMPLATE = f"""
+<g transform="translate(%s, %s)">
+<rect x=".5" y=".5" width="{_BOX_WIDTH}" height="{_BOX_HEIGHT}" rx="8.49" ry="8.49" style="fill: #24272e; stroke: #afdfe5; stroke-miterlimit: 10;"/>
+<text transform="translate({_NODE_NAME_INDENT} {_TEXT_CENTERING})" style="fill: #fff; font-size: {_FONT_SIZE_NODE_NAME}px;"><tspan x="0" y="0">%s</tspan></text>
+<text transform="translate({_TIME_INDENT} {_TEXT_CENTERING})" style="fill: #b7d989; font-size: {_FONT_SIZE_TIME}px; font-style: italic;"><tspan x="0" y="0">%s</tspan></text>
+</g>
+"""
+
+
+def create_tree_with_durations(
+    agent_duration: float, tool_durations: Dict[str, float]
+) -> List:
+    """Create the tree data to be converted to an SVG, including the agent and tools duration in seconds."""
+    data = [(0, 0, "AGENT", f"{agent_duration:.3f}")]
+    data.extend(
+        (row, 1, tool_name.upper(), f"{duration:.3f}")
+        for row, (tool_name, duration) in enumerate(tool_durations.items(), start=1)
+    )
     return data
 
 
 def create_svg_with_durations(data: List) -> str:
     """Create an SVG with the tree data."""
-    box_height = 47
-    box_width = box_height * 10
-    row_constant = box_height + 7
-    indent_constant = 40
-    font_size_node_name = box_height * 0.4188
-    font_size_time = font_size_node_name - 4
-    text_centering = box_height * 0.6341
-    node_name_indent = box_height * 0.35
-    time_indent = box_height * 8.75
-
-    body = ""
-    for each in data:
-        row, indent, node_name, node_time = each
-        body_raw = f"""
-<g transform="translate({indent*indent_constant}, {row*row_constant})">
-<rect x=".5" y=".5" width="{box_width}" height="{box_height}" rx="8.49" ry="8.49" style="fill: #24272e; stroke: #afdfe5; stroke-miterlimit: 10;"/>
-<text transform="translate({node_name_indent} {text_centering})" style="fill: #fff; font-size: {font_size_node_name}px;"><tspan x="0" y="0">{node_name}</tspan></text>
-<text transform="translate({time_indent} {text_centering})" style="fill: #b7d989; font-size: {font_size_time}px; font-style: italic;"><tspan x="0" y="0">{node_time}</tspan></text>
-</g>
-        """
-        body += body_raw
-
-    base = f"""
-<?xml version="1.0" encoding="UTF-8"?>
-<svg id="Layer_1" data-name="Layer 1" xmlns="http://www.w3.org/2000/svg" viewBox="0 0 750 {len(data)*row_constant}">
-{body}
-</svg>
-    """
-    base = base.strip()
-    return base
+    rows = [
+        _ROW_TEMPLATE
+        % (indent * _INDENT_CONSTANT, row * _ROW_CONSTANT, node_name, node_time)
+        for row, indent, node_name, node_time in data
+    ]
+    return "".join([_SVG_HEADER % (len(data) * _ROW_CONSTANT), *rows, _SVG_FOOTER])
+
+
+def truncate_text(text: str, max_bytes: int) -> str:
+    """Truncate the text so that its UTF-8 encoding, including a truncation marker, fits in `max_bytes`."""
+    if max_bytes < _TRUNCATION_MARKER_BYTES:
+        raise ValueError(
+            f"`max_bytes` must be at least {_TRUNCATION_MARKER_BYTES} to fit the truncation marker, got {max_bytes}."
+        )
+    # A character takes at most 4 bytes in UTF-8, so short texts can skip the encoding
+    if len(text) * 4 <= max_bytes:
+        return text
+    encoded = text.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return text
+    kept = encoded[: max_bytes - _TRUNCATION_MARKER_BYTES].decode("utf-8", "ignore")
+    return kept + _TRUNCATION_MARKER
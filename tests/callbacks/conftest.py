@@ -0,0 +1,98 @@
+# Copyright 2023-present, Argilla, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest.mock import Mock
+
+import argilla as rg
+import pytest
+from argilla.client.singleton import ArgillaSingleton
+from argilla_haystack import ArgillaCallbackHandler
+
+DATASET_NAME = "test_dataset"
+API_URL = "http://localhost:6900/"
+API_KEY = "argilla.apikey"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def argilla_server():
+    """Stand in for the Argilla server, so that every xdist worker keeps its datasets in memory"""
+
+    def init(**kwargs):
+        ArgillaSingleton._INSTANCE = Mock()
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(ArgillaSingleton, "_INSTANCE", None)
+        monkeypatch.setattr(rg, "init", Mock(side_effect=init))
+        monkeypatch.setattr(rg, "get_workspace", Mock(return_value="argilla"))
+        monkeypatch.setattr(
+            rg.FeedbackDataset,
+            "from_argilla",
+            Mock(side_effect=ValueError("`FeedbackDataset` not found")),
+        )
+        monkeypatch.setattr(
+            rg.FeedbackDataset, "push_to_argilla", lambda self, *args, **kwargs: self
+        )
+        monkeypatch.setattr(
+            rg.FeedbackDataset,
+            "add_records",
+            lambda self, records, show_progress=True: None,
+        )
+        yield
+
+
+def _new_agent():
+    from haystack.agents.base import Agent
+    from haystack.nodes import PromptNode
+
+    return Agent(prompt_node=Mock(spec=PromptNode))
+
+
+@pytest.fixture(scope="module")
+def agent():
+    return _new_agent()
+
+
+@pytest.fixture(scope="module")
+def callback_handler(agent):
+    handler = ArgillaCallbackHandler(
+        agent=agent,
+        dataset_name=DATASET_NAME,
+        api_url=API_URL,
+        api_key=API_KEY,
+    )
+    yield handler
+    handler.close()
+
+
+@pytest.fixture
+def callback_handler_factory():
+    """Build handlers, on fresh agents unless one is given, closing them on teardown"""
+    handlers = []
+
+    def factory(**kwargs):
+        handler = ArgillaCallbackHandler(
+            **{
+                "agent": _new_agent(),
+                "dataset_name": DATASET_NAME,
+                "api_url": API_URL,
+                "api_key": API_KEY,
+                **kwargs,
+            }
+        )
+        handlers.append(handler)
+        return handler
+
+    yield factory
+    for handler in handlers:
+        handler.close()
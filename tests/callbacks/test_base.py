@@ -0,0 +1,374 @@
+# Copyright 2023-present, Argilla, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+import queue
+import warnings
+from unittest.mock import Mock, patch
+
+import httpx
+import pytest
+from argilla.client.feedback.constants import PUSHING_BATCH_SIZE
+from argilla_haystack import ArgillaCallbackHandler, base
+from haystack.agents import AgentStep
+from haystack.agents.base import Tool
+
+_TOOL_MOCK = Mock(spec=Tool)
+_TOOL_MOCK.name = "test_tool"
+
+
+@pytest.fixture(autouse=True)
+def _reset_callback_handler(callback_handler):
+    """Reset the state of the module-scoped handler that each test relies on"""
+    callback_handler.metadata = {}
+    callback_handler.tool_start_times = {}
+    callback_handler.tool_durations = {}
+    callback_handler._queue_full_warned = False
+
+
+@pytest.fixture
+def add_records_calls(callback_handler, monkeypatch):
+    """Capture the keyword arguments of every `dataset.add_records` call"""
+    calls = []
+    monkeypatch.setattr(
+        callback_handler.dataset,
+        "add_records",
+        lambda **kwargs: calls.append(kwargs),
+    )
+    return calls
+
+
+@pytest.fixture(scope="module")
+def final_answer():
+    from haystack.schema import Answer
+
+    return {
+        "query": "test_query",
+        "answers": [Answer(answer="test_answer")],
+        "transcript": "test_transcript",
+    }
+
+
+def test_no_op_callbacks_are_not_registered(agent, callback_handler):
+    assert (
+        callback_handler.on_agent_step
+        not in agent.callback_manager.on_agent_step.targets
+    )
+
+
+def test_tool_callbacks_are_not_registered_without_tools(agent, callback_handler):
+    tool_manager = agent.tm.callback_manager
+    assert callback_handler.on_tool_start not in tool_manager.on_tool_start.targets
+    assert callback_handler.on_tool_finish not in tool_manager.on_tool_finish.targets
+    assert callback_handler.on_tool_error not in tool_manager.on_tool_error.targets
+
+
+def test_tool_callbacks_are_registered_with_tools(
+    callback_handler_factory, final_answer, monkeypatch
+):
+    from haystack.agents.base import Agent, ToolsManager
+    from haystack.nodes import PromptNode
+
+    tool = Tool(
+        name="test_tool",
+        pipeline_or_node=lambda tool_input: "test_tool_result",
+        description="test_description",
+    )
+    agent = Agent(prompt_node=Mock(spec=PromptNode), tools_manager=ToolsManager([tool]))
+    callback = callback_handler_factory(
+        agent=agent, dataset_name="test_dataset_with_tools"
+    )
+    tool_manager = agent.tm.callback_manager
+    assert callback.on_tool_start in tool_manager.on_tool_start.targets
+    assert callback.on_tool_finish in tool_manager.on_tool_finish.targets
+
+    add_records = Mock()
+    monkeypatch.setattr(callback.dataset, "add_records", add_records)
+    callback.on_agent_start(name="test_agent", query="test_query", params={})
+    agent.tm.run_tool("Tool: test_tool Tool Input: test_tool_input")
+    assert isinstance(callback.tool_durations["test_tool"], float)
+    callback.on_agent_final_answer(final_answer)
+    callback.flush()
+    record = add_records.call_args[1]["records"][0]
+    assert record["fields"]["transcript"] == "test_transcript"
+    assert record["metadata"] == {"tool_name": ["test_tool"], "type": "extractive"}
+
+
+def test_argilla_is_initialized_once(callback_handler):
+    with patch.object(base, "_ACTIVE_CREDENTIALS", None), patch.object(
+        base.rg, "init", wraps=base.rg.init
+    ) as init:
+        callback_handler._init_argilla()
+        callback_handler._init_argilla()
+    init.assert_called_once_with(
+        api_key=callback_handler.api_key, api_url=callback_handler.api_url
+    )
+
+
+def test_argilla_is_initialized_again_after_external_init(callback_handler):
+    with patch.object(base, "_ACTIVE_CREDENTIALS", None), patch.object(
+        base.rg, "init", wraps=base.rg.init
+    ) as init:
+        callback_handler._init_argilla()
+        base.rg.init(api_url="http://other:6900/", api_key="other.apikey")
+        callback_handler._init_argilla()
+    assert init.call_count == 3
+
+
+def test_dataset_is_prepared_lazily(callback_handler_factory):
+    callback = callback_handler_factory()
+    assert not callback._ready
+    assert callback.dataset is not None
+    assert callback._ready
+
+
+def test_dataset_is_reused(callback_handler_factory, callback_handler):
+    callback = callback_handler_factory()
+    assert callback.dataset is callback_handler.dataset
+
+
+def test_dataset_is_not_reused_across_api_keys(
+    callback_handler_factory, callback_handler
+):
+    callback = callback_handler_factory(api_key="other.apikey")
+    assert callback.dataset is not callback_handler.dataset
+
+
+def test_setup_failures_are_logged_by_the_worker(
+    callback_handler_factory, final_answer, caplog
+):
+    callback = callback_handler_factory()
+    with patch.object(
+        ArgillaCallbackHandler,
+        "_init_argilla",
+        side_effect=ConnectionError("test_error"),
+    ), caplog.at_level(logging.WARNING, logger="argilla_haystack.base"):
+        callback.on_agent_final_answer(final_answer)
+        callback.flush()
+    assert not callback._ready
+    assert "test_error" in caplog.text
+
+
+@patch.object(base, "_WARNED_DEFAULT_URL", False)
+@patch.object(base, "_WARNED_DEFAULT_KEY", False)
+def test_default_credentials_warn_once(callback_handler_factory):
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        for _ in range(2):
+            callback_handler_factory()
+    messages = [str(warning.message) for warning in caught]
+    assert sum("default api_key" in message for message in messages) == 1
+
+
+def test_slots(callback_handler):
+    assert not hasattr(callback_handler, "__dict__")
+
+
+def test_on_agent_start(callback_handler):
+    callback_handler.on_agent_start(name="test_agent", query="test_query", params={})
+    assert isinstance(callback_handler.start_time, float)
+    assert callback_handler.tool_start_times == {}
+    assert callback_handler.tool_durations == {}
+    assert callback_handler.metadata == {}
+
+
+def test_on_agent_step(callback_handler):
+    callback_handler.on_agent_step(agent_step=Mock(spec=AgentStep))
+
+
+def test_on_agent_finish(callback_handler):
+    callback_handler.on_agent_finish(agent_step=Mock(spec=AgentStep))
+    assert isinstance(callback_handler.finish_time, float)
+    assert isinstance(callback_handler.agent_duration, float)
+
+
+@pytest.mark.slow
+def test_on_agent_final_answer(callback_handler, add_records_calls, final_answer):
+    callback_handler.on_agent_final_answer(final_answer)
+    callback_handler.flush()
+    call_kwargs = add_records_calls[0]
+    assert call_kwargs["show_progress"] is False
+    records_arg = call_kwargs["records"][0]
+    assert records_arg["fields"]["prompt"] == "test_query"
+    assert records_arg["fields"]["response"] == "test_answer"
+    assert isinstance(records_arg["fields"].get("time-details"), str)
+    assert records_arg["metadata"] == {"type": "extractive"}
+
+
+def test_on_agent_final_answer_truncates_oversized_fields(
+    callback_handler_factory, monkeypatch
+):
+    from haystack.schema import Answer
+
+    callback = callback_handler_factory(max_field_bytes=32)
+    add_records = Mock()
+    monkeypatch.setattr(callback.dataset, "add_records", add_records)
+    callback.on_agent_final_answer(
+        {
+            "query": "q" * 100,
+            "answers": [Answer(answer="test_answer")],
+            "transcript": "test_transcript",
+        }
+    )
+    callback.flush()
+    fields = add_records.call_args[1]["records"][0]["fields"]
+    assert len(fields["prompt"].encode("utf-8")) <= 32
+    assert fields["prompt"].endswith("[truncated]")
+    assert fields["response"] == "test_answer"
+
+
+def test_max_field_bytes_smaller_than_the_marker_is_rejected(
+    callback_handler_factory,
+):
+    with pytest.raises(ValueError):
+        callback_handler_factory(max_field_bytes=10)
+
+
+def test_on_agent_final_answer_batches_records(
+    callback_handler, add_records_calls, final_answer
+):
+    callback_handler.on_agent_final_answer(final_answer)
+    callback_handler.on_agent_final_answer(final_answer)
+    callback_handler.flush()
+    assert len(add_records_calls) == 1
+    assert len(add_records_calls[0]["records"]) == 2
+
+
+def test_on_agent_final_answer_snapshots_metadata(
+    callback_handler, add_records_calls, final_answer
+):
+    callback_handler.on_agent_final_answer(final_answer)
+    callback_handler.metadata["type"] = "generative"
+    callback_handler.flush()
+    records_arg = add_records_calls[0]["records"][0]
+    assert records_arg["metadata"] == {"type": "extractive"}
+
+
+def test_on_agent_final_answer_drops_records_when_queue_is_full(
+    callback_handler, add_records_calls, caplog, final_answer
+):
+    with patch.object(
+        callback_handler._queue, "put_nowait", side_effect=queue.Full
+    ), caplog.at_level(logging.WARNING, logger="argilla_haystack.base"):
+        callback_handler.on_agent_final_answer(final_answer)
+        callback_handler.on_agent_final_answer(final_answer)
+    assert len(caplog.records) == 1
+    callback_handler.flush()
+    assert add_records_calls == []
+
+
+def test_aflush(callback_handler, add_records_calls, final_answer):
+    callback_handler.on_agent_final_answer(final_answer)
+    asyncio.run(callback_handler.aflush())
+    assert len(add_records_calls) == 1
+
+
+def test_submission_is_retried_on_transport_errors(
+    callback_handler, final_answer, monkeypatch
+):
+    add_records = Mock(side_effect=[httpx.ConnectError("test_error"), None])
+    monkeypatch.setattr(callback_handler.dataset, "add_records", add_records)
+    callback_handler.on_agent_final_answer(final_answer)
+    callback_handler.flush()
+    assert add_records.call_count == 2
+
+
+def test_retried_submissions_do_not_duplicate_records(callback_handler, monkeypatch):
+    from haystack.schema import Answer
+
+    requests, stored = [], []
+
+    def add_records(records, show_progress):
+        # Mimic the SDK, which sends the records in requests of `PUSHING_BATCH_SIZE`
+        for start in range(0, len(records), PUSHING_BATCH_SIZE):
+            requests.append(start)
+            if len(requests) == 2:
+                raise httpx.ConnectError("test_error")
+            stored.extend(records[start : start + PUSHING_BATCH_SIZE])
+
+    monkeypatch.setattr(callback_handler.dataset, "add_records", add_records)
+    for i in range(2 * PUSHING_BATCH_SIZE):
+        callback_handler.on_agent_final_answer(
+            {
+                "query": f"test_query_{i}",
+                "answers": [Answer(answer="test_answer")],
+                "transcript": "test_transcript",
+            }
+        )
+    callback_handler.flush()
+    prompts = [record["fields"]["prompt"] for record in stored]
+    assert sorted(prompts) == sorted(set(prompts))
+    assert len(prompts) == 2 * PUSHING_BATCH_SIZE
+
+
+def test_submission_is_not_retried_on_read_timeouts(
+    callback_handler, final_answer, monkeypatch
+):
+    add_records = Mock(side_effect=httpx.ReadTimeout("test_error"))
+    monkeypatch.setattr(callback_handler.dataset, "add_records", add_records)
+    callback_handler.on_agent_final_answer(final_answer)
+    callback_handler.flush()
+    assert add_records.call_count == 1
+
+
+def test_close(callback_handler_factory, final_answer, monkeypatch):
+    callback = callback_handler_factory()
+    calls = []
+    monkeypatch.setattr(
+        callback.dataset, "add_records", lambda **kwargs: calls.append(kwargs)
+    )
+    callback.on_agent_final_answer(final_answer)
+    with patch.object(base.atexit, "unregister") as unregister:
+        callback.close()
+    assert len(calls) == 1
+    assert not callback._worker.is_alive()
+    unregister.assert_called_once_with(callback.close)
+
+
+def test_on_tool_start(callback_handler):
+    mock_tool = Mock(spec=Tool)
+    mock_tool.name = "test_tool"
+    callback_handler.on_tool_start(tool_input="test_tool_input", tool=mock_tool)
+    assert isinstance(callback_handler.tool_start_time, float)
+    expected_key = mock_tool.name
+    assert callback_handler.tool_start_times == {
+        expected_key: callback_handler.tool_start_time
+    }
+
+
+def test_on_tool_finish(callback_handler):
+    callback_handler.on_tool_finish(
+        tool_result="test_tool_result",
+        tool_name="test_tool_name",
+        tool_input="test_tool_input",
+    )
+    assert callback_handler.tool_durations == {}
+    assert callback_handler.metadata == {"tool_name": ["test_tool_name"]}
+
+
+def test_on_tool_finish_records_duration(callback_handler):
+    mock_tool = Mock(spec=Tool)
+    mock_tool.name = "test_tool_name"
+    callback_handler.on_tool_start(tool_input="test_tool_input", tool=mock_tool)
+    callback_handler.on_tool_finish(
+        tool_result="test_tool_result",
+        tool_name="test_tool_name",
+        tool_input="test_tool_input",
+    )
+    assert isinstance(callback_handler.tool_durations["test_tool_name"], float)
+
+
+def test_on_tool_error(callback_handler):
+    callback_handler.on_tool_error(exception=Exception(), tool=_TOOL_MOCK)
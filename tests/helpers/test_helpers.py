@@ -0,0 +1,100 @@
+# Copyright 2023-present, Argilla, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+
+import pytest
+from argilla_haystack.helpers import (
+    create_svg_with_durations,
+    create_tree_with_durations,
+    truncate_text,
+)
+
+_TSPAN_RE = re.compile(r'<tspan x="0" y="0">([^<]+)</tspan>')
+_BIG_TOOL_DURATIONS = {f"tool{i}": float(i) for i in range(1000)}
+_BIG_EXPECTED_RESULT = [(0, 0, "AGENT", "10.255")] + [
+    (i + 1, 1, f"TOOL{i}", f"{i:.3f}") for i in range(1000)
+]
+
+
+@pytest.mark.parametrize(
+    "agent_duration, tool_durations, expected_result",
+    [
+        (10.255, {}, [(0, 0, "AGENT", "10.255")]),
+        (
+            10.255,
+            {"tool1": 1.0, "tool2": 2.56, "tool3": 2.1},
+            [
+                (0, 0, "AGENT", "10.255"),
+                (1, 1, "TOOL1", "1.000"),
+                (2, 1, "TOOL2", "2.560"),
+                (3, 1, "TOOL3", "2.100"),
+            ],
+        ),
+        (10.255, _BIG_TOOL_DURATIONS, _BIG_EXPECTED_RESULT),
+    ],
+)
+def test_create_tree_with_durations(agent_duration, tool_durations, expected_result):
+    assert create_tree_with_durations(agent_duration, tool_durations) == expected_result
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        [(0, 0, "AGENT", "1")],
+        [
+            (0, 0, "AGENT", "10.255"),
+            (1, 1, "TOOL1", "1"),
+            (2, 1, "TOOL2", "2.56"),
+            (3, 1, "TOOL3", "2.1"),
+        ],
+        [],
+    ],
+)
+@pytest.mark.slow
+def test_create_svg_with_dynamic_content(data):
+    svg_output = create_svg_with_durations(data)
+
+    assert svg_output.endswith("</svg>")
+    assert svg_output.count("<tspan") == 2 * len(data)
+    tspans = set(_TSPAN_RE.findall(svg_output))
+    for _, _, label, duration in data:
+        assert label in tspans
+        assert duration in tspans
+
+
+@pytest.mark.parametrize(
+    "text, max_bytes",
+    [
+        ("short text", 64),
+        ("a" * 100, 32),
+        ("é" * 100, 33),
+        ("🦙" * 100, 64),
+        ("a" * 100, len("\n…[truncated]".encode("utf-8"))),
+    ],
+)
+def test_truncate_text(text, max_bytes):
+    truncated = truncate_text(text, max_bytes)
+    if len(text.encode("utf-8")) <= max_bytes:
+        assert truncated == text
+    else:
+        assert len(truncated.encode("utf-8")) <= max_bytes
+        assert truncated.endswith("[truncated]")
+        assert text.startswith(truncated[: -len("\n…[truncated]")])
+
+
+@pytest.mark.parametrize("max_bytes", [0, 10])
+def test_truncate_text_rejects_caps_smaller_than_the_marker(max_bytes):
+    with pytest.raises(ValueError):
+        truncate_text("a" * 100, max_bytes)